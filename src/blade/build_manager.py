@@ -507,7 +507,8 @@ class Blade(object):
             os.makedirs(target_dir)
         with open(ninja_file, 'w') as f:
             f.write('%s%s\n\n' % (_NINJA_FILE_FINGERPRINT_START, fingerprint))
-            f.writelines(code)
+            # The buffered rules have no ending newlines, join them in one pass
+            f.write('\n'.join(code))
 
     def _find_or_generate_target_ninja_file(self, target):
         # The `.build.` infix is used to avoid the target ninja file with the
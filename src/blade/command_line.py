@@ -14,6 +14,8 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import argparse
+import os
+import sys
 
 # https://pypi.org/project/argcomplete/
 try:
@@ -24,14 +26,50 @@ except ImportError:
 
 from blade import console
 from blade import constants
-from blade.toolchain import BuildArchitecture
-from blade.toolchain import ToolChain
 
-# The 'blade_version.py' is generated by the dist script, then it only exists in blade.zip
-try:
-    from blade.blade_version import VERSION
-except ImportError:
-    VERSION = '(developing, unversioned)'
+# NOTE: blade.toolchain and the generated version module are imported lazily in
+# the functions using them to keep the import graph of startup small.
+
+
+def _get_version():
+    """Return the blade version string."""
+    # The 'blade_version.py' is generated by the dist script, then it only exists in blade.zip
+    try:
+        # pylint: disable=import-outside-toplevel
+        from blade.blade_version import VERSION
+        return VERSION
+    except ImportError:
+        return '(developing, unversioned)'
+
+
+class _ArgumentRecorder(object):
+    """Records argument registrations to be replayed on a real parser later.
+
+    `argparse.ArgumentParser.add_argument` does a lot of eager bookkeeping and
+    validation. Recording the registrations into plain tuples makes them
+    reusable, so they can be replayed only onto the subparser actually selected
+    by the command line, and only once collected per process.
+    """
+
+    def __init__(self):
+        self._calls = []
+
+    def add_argument(self, *args, **kwargs):
+        self._calls.append(('argument', args, kwargs))
+
+    def add_mutually_exclusive_group(self, **kwargs):
+        group = _ArgumentRecorder()
+        self._calls.append(('group', kwargs, group))
+        return group
+
+    def replay(self, parser):
+        """Apply the recorded registrations to a real parser or group."""
+        add_argument = parser.add_argument
+        for call in self._calls:
+            if call[0] == 'argument':
+                add_argument(*call[1], **call[2])
+            else:
+                call[2].replay(parser.add_mutually_exclusive_group(**call[1]))
 
 
 class CommandLineParser(object):
@@ -42,9 +80,9 @@ class CommandLineParser(object):
 
     """
 
-    def __init__(self):
+    def __init__(self, argv):
         """Init the class."""
-        self._arg_parser = self._build_arg_parser()
+        self._arg_parser = self._build_arg_parser(argv)
         if argcomplete:
             argcomplete.autocomplete(self._arg_parser)
 
@@ -55,18 +93,18 @@ class CommandLineParser(object):
 
         # If '--' in arguments, use all other arguments after it as run
         # arguments
-        if '--' in others:
+        try:
             pos = others.index('--')
             targets = others[:pos]
             options.args = others[pos + 1:]
-        else:
+        except ValueError:
             targets = others
             options.args = []
 
-        for t in targets:
-            if t.startswith('-'):
-                console.fatal('Unrecognized option %s, use blade [action] '
-                              '--help to get all the options' % t)
+        bad = next((t for t in targets if t.startswith('-')), None)
+        if bad is not None:
+            console.fatal('Unrecognized option %s, use blade [action] '
+                          '--help to get all the options' % bad)
 
         command = options.command
         # Check the options with different sub command
@@ -98,6 +136,7 @@ class CommandLineParser(object):
 
     def _check_plat_and_profile_options(self, options, targets):
         """check platform and profile options."""
+        from blade.toolchain import BuildArchitecture  # pylint: disable=import-outside-toplevel
         compiler_arch = self._compiler_target_arch()
         arch = BuildArchitecture.get_canonical_architecture(compiler_arch)
         if arch is None:
@@ -414,54 +453,122 @@ class CommandLineParser(object):
         group.add_argument(
             '--all-tags', dest='dump_all_tags', default=False, action='store_true',
             help='Dump all tags of targets in json format')
-    def _build_arg_parser(self):
+    def _populate_build_parser(self, parser):
+        """Add all arguments of the build command."""
+        self._add_common_arguments(parser)
+        self._add_build_arguments(parser)
+
+    def _populate_run_parser(self, parser):
+        """Add all arguments of the run command."""
+        self._add_common_arguments(parser)
+        self._add_build_arguments(parser)
+        self._add_run_arguments(parser)
+
+    def _populate_test_parser(self, parser):
+        """Add all arguments of the test command."""
+        self._add_common_arguments(parser)
+        self._add_build_arguments(parser)
+        self._add_test_arguments(parser)
+
+    def _populate_clean_parser(self, parser):
+        """Add all arguments of the clean command."""
+        self._add_common_arguments(parser)
+        self._add_clean_arguments(parser)
+
+    def _populate_query_parser(self, parser):
+        """Add all arguments of the query command."""
+        self._add_common_arguments(parser)
+        self._add_query_arguments(parser)
+
+    def _populate_dump_parser(self, parser):
+        """Add all arguments of the dump command."""
+        self._add_common_arguments(parser)
+        self._add_build_arguments(parser)
+        self._add_dump_arguments(parser)
+
+    # Subcommand name -> (brief help, extra `add_parser` arguments)
+    _sub_commands = {
+        'build': ('Build specified targets', {}),
+        'run': ('Build and runs a single target',
+                {'epilog': 'Any arguments after the empty "--" will be passed to the program'}),
+        'test': ('Build the specified targets and runs tests',
+                 {'epilog': 'Any arguments after the empty "--" will be passed to the program'}),
+        'clean': ('Remove all blade-created output', {}),
+        'query': ('Execute a dependency graph query', {}),
+        'dump': ('Dump specified internal information', {}),
+    }
+
+    # Recorded argument registrations of each subcommand, collected on first use
+    _argument_records = None
+
+    def _get_argument_records(self):
+        """Return the recorded argument registrations of each subcommand."""
+        cls = CommandLineParser
+        if cls._argument_records is None:
+            populators = {
+                'build': self._populate_build_parser,
+                'run': self._populate_run_parser,
+                'test': self._populate_test_parser,
+                'clean': self._populate_clean_parser,
+                'query': self._populate_query_parser,
+                'dump': self._populate_dump_parser,
+            }
+            records = {}
+            for name, populate in populators.items():
+                recorder = _ArgumentRecorder()
+                populate(recorder)
+                records[name] = recorder
+            cls._argument_records = records
+        return cls._argument_records
+
+    @staticmethod
+    def _find_sub_command(argv):
+        """Find the subcommand to be executed from argv.
+
+        Returns the subcommand name, or None if it can't be determined
+        (then all subparsers have to be populated to report correct errors).
+        """
+        if '_ARGCOMPLETE' in os.environ:
+            # Completion may need arguments of any subcommand
+            return None
+        for arg in argv:
+            if not arg.startswith('-'):
+                return arg if arg in CommandLineParser._sub_commands else None
+        return None
+
+    def _build_arg_parser(self, argv):
         """Add command options, add options whthin this method."""
         blade_cmd_help = 'blade <subcommand> [options...] [targets...]'
         arg_parser = argparse.ArgumentParser(prog='blade', description=blade_cmd_help)
-        arg_parser.add_argument('--version', action='version', version='%(prog)s ' + VERSION)
+        arg_parser.add_argument('--version', action='version', version='%(prog)s ' + _get_version())
         sub_parser = arg_parser.add_subparsers(dest='command', help='Available subcommands')
 
         sub_parser.required = True
 
-        build_parser = sub_parser.add_parser(
-            'build',
-            help='Build specified targets')
-
-        run_parser = sub_parser.add_parser(
-            'run',
-            help='Build and runs a single target',
-            epilog='Any arguments after the empty "--" will be passed to the program')
-
-        test_parser = sub_parser.add_parser(
-            'test',
-            help='Build the specified targets and runs tests',
-            epilog='Any arguments after the empty "--" will be passed to the program')
-
-        clean_parser = sub_parser.add_parser(
-            'clean',
-            help='Remove all blade-created output')
-
-        query_parser = sub_parser.add_parser(
-            'query',
-            help='Execute a dependency graph query')
-
-        dump_parser = sub_parser.add_parser(
-            'dump',
-            help='Dump specified internal information')
-
-        self._add_common_arguments(build_parser, run_parser, test_parser,
-                                   clean_parser, query_parser, dump_parser)
-        self._add_build_arguments(build_parser, run_parser, test_parser, dump_parser)
-        self._add_run_arguments(run_parser)
-        self._add_test_arguments(test_parser)
-        self._add_clean_arguments(clean_parser)
-        self._add_query_arguments(query_parser)
-        self._add_dump_arguments(dump_parser)
+        # Registering the hundreds of arguments of all subcommands dominates the
+        # startup time, but each invocation dispatches to at most one subcommand.
+        # So only the selected subparser is fully populated, the others are
+        # registered as empty stubs to keep the top level help message intact.
+        command = self._find_sub_command(argv)
+        if command is not None:
+            selected = (command,)
+        elif argv in ([], ['-h'], ['--help']):
+            # The top level help/error message only lists the subcommand names,
+            # the stub subparsers are enough for it.
+            selected = ()
+        else:
+            selected = tuple(self._sub_commands)
+        records = self._get_argument_records() if selected else None
+        for name, (help, kwargs) in self._sub_commands.items():
+            parser = sub_parser.add_parser(name, help=help, **kwargs)
+            if name in selected:
+                records[name].replay(parser)
 
         return arg_parser
 
     def _compiler_target_arch(self):
         """Compiler(gcc) target architecture."""
+        from blade.toolchain import ToolChain  # pylint: disable=import-outside-toplevel
         arch = ToolChain.get_cc_target_arch()
         pos = arch.find('-')
         if pos == -1:
@@ -471,5 +578,9 @@ class CommandLineParser(object):
 
 def parse(argv):
     """Parse argv into command, options and targets"""
-    parser = CommandLineParser()
+    if argv == ['--version']:
+        # Fast path, no need to build the parser at all
+        print('blade ' + _get_version())
+        sys.exit(0)
+    parser = CommandLineParser(argv)
     return parser.parse(argv)
@@ -13,6 +13,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import os
+import re
 
 from blade import build_manager
 from blade import build_rules
@@ -115,16 +116,22 @@ class GenRuleTarget(Target):
     def _allow_duplicate_source(self):
         return True
 
+    # Variables to be expanded in `cmd`, combined into one regex so that
+    # expansion walks the command string once instead of once per variable.
+    _CMD_VAR_RE = re.compile(r'\$(SRCS|SRC_DIR|OUTS|OUT_DIR|FIRST_SRC|FIRST_OUT|BUILD_DIR)')
+
     def _expand_command(self):
         """Expand vars and location references in command"""
-        cmd = self.attr['cmd']
-        cmd = cmd.replace('$SRCS', '${in}')
-        cmd = cmd.replace('$OUTS', '${out}')
-        cmd = cmd.replace('$FIRST_SRC', '${_in_1}')
-        cmd = cmd.replace('$FIRST_OUT', '${_out_1}')
-        cmd = cmd.replace('$SRC_DIR', self.path)
-        cmd = cmd.replace('$OUT_DIR', os.path.join(self.build_dir, self.path))
-        cmd = cmd.replace('$BUILD_DIR', self.build_dir)
+        vars = {
+            'SRCS': '${in}',
+            'OUTS': '${out}',
+            'FIRST_SRC': '${_in_1}',
+            'FIRST_OUT': '${_out_1}',
+            'SRC_DIR': self.path,
+            'OUT_DIR': os.path.join(self.build_dir, self.path),
+            'BUILD_DIR': self.build_dir,
+        }
+        cmd = self._CMD_VAR_RE.sub(lambda m: vars[m.group(1)], self.attr['cmd'])
         locations = self.attr['locations']
         if locations:
             targets = self.blade.get_build_targets()
@@ -199,7 +199,8 @@ class ProtoLibrary(CcTarget, java_targets.JavaTargetMixIn):
             protoc_plugins.append(p)
             for language, v in iteritems(p.code_generation):
                 for key in v['deps']:
-                    if key not in self.deps:
+                    if key not in self._deps_set:
+                        self._deps_set.add(key)
                         self.deps.append(key)
                     protoc_plugin_deps.add(key)
                     if language == 'java':
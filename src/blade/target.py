@@ -19,7 +19,7 @@ from blade import config
 from blade import console
 from blade import target_pattern
 from blade import target_tags
-from blade.util import var_to_list, iteritems, source_location, md5sum
+from blade.util import var_to_list, iteritems, source_location, fast_hasher, intern_str
 
 
 def _is_likely_concatenated_filenames(string, exts):
@@ -47,6 +47,51 @@ _TARGET_RE = re.compile(r'(?P<path>((//)?[\w./+-]+)?:|#)(?P<name>[\w.+-]*)$')
 LOCATION_RE = re.compile(r'\$\(location\s+(\S*:\S+)(\s+\w*)?\)')
 
 
+_config_item_cache = {}
+
+
+def _cached_config_item(section_name, item_name):
+    """Cached config.get_item, for items read once per target.
+
+    Config items never change after the configuration is loaded, which happens
+    before any BUILD file is loaded, so looking them up through the config
+    sections for every target is wasted work.
+    """
+    key = (section_name, item_name)
+    if key not in _config_item_cache:
+        _config_item_cache[key] = config.get_item(section_name, item_name)
+    return _config_item_cache[key]
+
+
+def _join_norm(a, b):
+    """Same as `os.path.normpath(os.path.join(a, b))` but faster.
+
+    Both are pure python and allocate several intermediate strings. For the
+    overwhelmingly common case where `a` is already normalized (as target and
+    build dir paths are) and `b` is a plain relative path, a simple
+    concatenation gives the same result.
+    """
+    if (a and b and a[0] not in '/.' and a[-1] != '/' and b[0] not in '/.' and
+            '..' not in b and '//' not in b and '/./' not in b and b[-1] != '/'):
+        return a + '/' + b
+    return os.path.normpath(os.path.join(a, b))
+
+
+def _build_file(path):
+    """Memoized `os.path.join(path, 'BUILD')`.
+
+    Every target constructed from the same BUILD file needs this path, share
+    one string instead of re-joining it per target.
+    """
+    result = _build_file.cache.get(path)
+    if result is None:
+        result = _build_file.cache[path] = os.path.join(path, 'BUILD')
+    return result
+
+
+_build_file.cache = {}
+
+
 def _check_path(path):
     msg = []
     if path.startswith('//'):
@@ -107,6 +152,41 @@ class Target(object):
 
     """
 
+    # Blade creates one target instance per BUILD rule, tens of thousands in a
+    # large workspace. Slots cut the per-instance dict overhead and speed up
+    # attribute access. Extensible per-target values belong in `attr`/`data`.
+    __slots__ = (
+        'blade',
+        'target_database',
+        'type',
+        'name',
+        'cmd',
+        'path',
+        'build_dir',
+        'target_dir',
+        'key',
+        'fullname',
+        'source_location',
+        'srcs',
+        'deps',
+        '_deps_set',
+        'expanded_deps',
+        'dependents',
+        'expanded_dependents',
+        '_implicit_deps',
+        '_visibility',
+        '_visibility_is_default',
+        'attr',
+        'data',
+        'tags',
+        '__targets',
+        '__target_files_cache',
+        '__default_target',
+        '__clean_list',
+        '__build_code',
+        '__fingerprint',
+    )
+
     def __init__(self,
                  name,
                  type,
@@ -136,12 +216,18 @@ class Target(object):
         self.target_dir = os.path.normpath(os.path.join(self.build_dir, current_source_path))
 
         # The unique key of this target, for internal use mainly.
-        self.key = '%s:%s' % (current_source_path, name)
+        # Interned because it is used as a dict key all over and equal keys
+        # recur across target dep lists, sharing identity makes the lookups
+        # cheaper and saves duplicated strings.
+        self.key = intern_str('%s:%s' % (current_source_path, name))
         # The full qualified target id, to be displayed in diagnostic message
         self.fullname = '//' + self.key
-        self.source_location = source_location(os.path.join(current_source_path, 'BUILD'))
+        self.source_location = source_location(_build_file(current_source_path))
         self.srcs = srcs
         self.deps = []
+        # Set mirror of `deps` for O(1) membership tests, `deps` stays a list
+        # to preserve the declaration order.
+        self._deps_set = set()
 
         # Expanded dependencies, includes direct and indirect dependies.
         self.expanded_deps = []    # Provide type info then make lints happy(not-an-iterable).
@@ -160,6 +246,7 @@ class Target(object):
         # may correspond to several target files, such as:
         # proto_library: static lib/shared lib/jar variables
         self.__targets = {}
+        self.__target_files_cache = None
         self.__default_target = ''
         self.__clean_list = []  # Paths to be cleaned
 
@@ -172,7 +259,7 @@ class Target(object):
         self.tags = set()
 
         # TODO: Remove it, make a `TestTargetMixin`
-        self.attr['test_timeout'] = config.get_item('global_config', 'test_timeout')
+        self.attr['test_timeout'] = _cached_config_item('global_config', 'test_timeout')
 
         self._check_name()
         self._check_kwargs(kwargs)
@@ -210,36 +297,78 @@ class Target(object):
         """
         return self.attr
 
+    def _hash_entropy_value(self, h, value):
+        """Feed an entropy value into the hasher, with type tags to avoid ambiguity.
+
+        Streaming the values directly into the hasher avoids building a big
+        throwaway repr string of the whole entropy dict just for hashing.
+        """
+        if isinstance(value, str):
+            h.update(b's')
+            h.update(value.encode('utf-8'))
+            h.update(b'\0')
+        elif value is None:
+            h.update(b'N')
+        elif isinstance(value, bool):
+            h.update(b'T' if value else b'F')
+        elif isinstance(value, (int, float)):
+            h.update(('d%r' % value).encode('utf-8'))
+        elif isinstance(value, (list, tuple)):
+            h.update(b'[')
+            for v in value:
+                self._hash_entropy_value(h, v)
+            h.update(b']')
+        elif isinstance(value, (set, frozenset)):
+            h.update(b'(')
+            for v in sorted(value):
+                self._hash_entropy_value(h, v)
+            h.update(b')')
+        elif isinstance(value, dict):
+            # Sort to make the result stable
+            h.update(b'{')
+            for k, v in sorted(iteritems(value)):
+                self._hash_entropy_value(h, k)
+                self._hash_entropy_value(h, v)
+            h.update(b'}')
+        else:
+            # Entropy can't cantain a normal object, because it's default repr contains address,
+            # which is changed in different build, so it should not be used as stable hash entropy.
+            # If this error is raised, remove the culprit element from entropy if it is unrelated
+            # or convert it to one of the allowed types above if it is related.
+            raise TypeError('Invalid fingerprint entropy type "%s" in target "%s"' % (
+                type(value).__name__, self.fullname))
+
     def fingerprint(self):
         """Calculate a hash string to be used to judge whether regenerate per-target ninja file"""
         if self.__fingerprint is None:
             # All build related factors should be added to avoid outdated ninja file beeing used.
-            entropy = {
-                'blade_revision': self.blade.revision(),
-                'config': config.digest(),
-                'type': self.type,
-                'name': self.name,
-                'srcs': self.srcs,
-            }
-            entropy['deps'] = [self.target_database[dep].fingerprint() for dep in self.deps]
-            entropy['cmd'] = self.cmd
-
-            # Add more entropy
-            entropy.update(self._fingerprint_entropy())
-
-            # Sort to make the result stable
-            entropy_str = str(sorted(entropy.items()))
-
-            # Entropy dict can't cantains normal object, because it's default repr contains address,
-            # which is changed in different build, so it should not be used as stable hash entropy.
-            # If this assert failed, remove the culprit element from entropy if it is unrelated or
-            # override it's `__repe__` if it is related.
-            assert ' object at 0x' not in entropy_str
-            self.__fingerprint = md5sum(entropy_str)
+            # They are fed into the hasher directly in a fixed order, building
+            # a dict just to be hashed would only add allocations.
+            h = fast_hasher()
+            hash_value = self._hash_entropy_value
+            hash_value(h, self.blade.revision())
+            hash_value(h, config.digest())
+            hash_value(h, self.type)
+            hash_value(h, self.name)
+            hash_value(h, self.srcs)
+            hash_value(h, self.cmd)
+            # Add more entropy, sorted to make the result stable
+            for k, v in sorted(iteritems(self._fingerprint_entropy())):
+                hash_value(h, k)
+                hash_value(h, v)
+            # Each dep's fingerprint is memoized in its own target, feed the
+            # hex strings straight into the hasher instead of collecting them
+            # into a list inside the entropy dict.
+            h.update(b'deps')
+            for dep in self.deps:
+                h.update(self.target_database[dep].fingerprint().encode('utf-8'))
+            self.__fingerprint = h.hexdigest()
         return self.__fingerprint
 
     def _format_message(self, level, msg):
-        return '%s: %s: %s: %s' % (self.source_location, level, self.name, msg)
+        # Plain concatenation is faster than %-formatting, this helper is on
+        # the path of every diagnostic message
+        return self.source_location + ': ' + level + ': ' + self.name + ': ' + msg
 
     def debug(self, msg):
         """Print message with target full name prefix"""
@@ -310,32 +439,42 @@ class Target(object):
         for path in path_list:
             self._check_path(path, attr_name, must_exist)
 
+    def _check_source_file(self, file_kind, src, exts):
+        """Check path and extension of a single source file."""
+        if '..' in src or src.startswith('/'):
+            self.error('Invalid %s file path: %s. can only be relative path, and must '
+                       'in current directory or subdirectories.' % (file_kind, src))
+        if not exts:
+            return
+        _, ext = os.path.splitext(src)
+        if ext:
+            ext = ext[1:]
+        if ext not in exts:
+            self.error('Invalid %s file name: "%s", must ends with %s' % (file_kind, src, list(exts)))
+        full_path = self._source_file_path(src)
+        if not os.path.exists(full_path):
+            if ext and _is_likely_concatenated_filenames(src, exts):
+                self.warning('File "%s" does not exist, missing "," between file names?' % src)
+
     def _check_sources(self, file_kind, files, exts):
         """Check source files."""
-        dups = []
-        srcset = set()
-        for src in files:
-            if src in srcset:
-                dups.append(src)
-            else:
-                srcset.add(src)
-            if '..' in src or src.startswith('/'):
-                self.error('Invalid %s file path: %s. can only be relative path, and must '
-                           'in current directory or subdirectories.' % (file_kind, src))
-            if not exts:
-                continue
-            _, ext = os.path.splitext(src)
-            if ext:
-                ext = ext[1:]
-            if ext not in exts:
-                self.error('Invalid %s file name: "%s", must ends with %s' % (file_kind, src, list(exts)))
-            full_path = self._source_file_path(src)
-            if not os.path.exists(full_path):
-                if ext and _is_likely_concatenated_filenames(src, exts):
-                    self.warning('File "%s" does not exist, missing "," between file names?' % src)
-
+        dups = self._find_duplicate_files(files)
         if dups:
             self.error('Duplicate %s file paths: %s ' % (file_kind, dups))
+        for src in files:
+            self._check_source_file(file_kind, src, exts)
+
+    @staticmethod
+    def _find_duplicate_files(files):
+        """Return duplicated entries of the file list, usually empty.
+
+        The usual all-unique case is decided by a single C-level set
+        construction, the python-level collection loop only runs on error.
+        """
+        if len(set(files)) == len(files):
+            return []
+        seen = set()
+        return [f for f in files if f in seen or seen.add(f)]
 
     # Keep the relationship of all src -> target.
     # Used by build rules to ensure that a source file occurs in
@@ -344,12 +483,17 @@ class Target(object):
 
     def _check_srcs(self, src_exts):
         """Check the "src" attribute."""
-        self._check_sources('source', self.srcs, src_exts)
-        # Check if one file belongs to two different targets.
-        action = config.get_item('global_config', 'duplicated_source_action')
+        # Fused single pass over srcs: per-file checks and the cross-target
+        # duplicate source check. In-target duplicates are found up front.
+        dups = self._find_duplicate_files(self.srcs)
+        if dups:
+            self.error('Duplicate source file paths: %s ' % dups)
+        action = _cached_config_item('global_config', 'duplicated_source_action')
+        target = self.fullname, self._allow_duplicate_source()
         for src in self.srcs:
-            full_src = os.path.normpath(os.path.join(self.path, src))
-            target = self.fullname, self._allow_duplicate_source()
+            self._check_source_file('source', src, src_exts)
+            # Check if one file belongs to two different targets.
+            full_src = _join_norm(self.path, src)
             if full_src not in Target.__src_target_map:
                 Target.__src_target_map[full_src] = target
             else:
@@ -371,21 +515,32 @@ class Target(object):
     def _add_implicit_library(self, implicit_deps):
         """Add implicit dep list to key's deps."""
         for dep in implicit_deps:
-            if not dep.startswith('//') and not dep.startswith('#'):
+            if not dep.startswith(('//', '#')):
                 dep = '//' + dep
             dkey = self._unify_dep(dep)
             if not dkey:
                 return
             if dkey[0] == '#':
                 self._add_system_library(dkey, dkey[2:])
-            if dkey not in self.deps:
+            if dkey not in self._deps_set:
+                self._deps_set.add(dkey)
                 self.deps.append(dkey)
             self._implicit_deps.add(dkey)
 
+    # Keys of the already registered system libraries, checking this small set
+    # is cheaper than a lookup in the whole target database. Rebound when the
+    # database changes (tests may create several Blade instances in a process).
+    _registered_system_libs = (None, ())
+
     def _add_system_library(self, key, name):
         """Add system library entry to database."""
-        if key not in self.target_database:
+        database, registered = Target._registered_system_libs
+        if database is not self.target_database:
+            registered = set()
+            Target._registered_system_libs = (self.target_database, registered)
+        if key not in registered:
             assert key[2:] == name
+            registered.add(key)
             lib = SystemLibrary(name)
             self.blade.register_target(lib)
 
@@ -433,15 +588,27 @@ class Target(object):
             type = ''
         type = type.strip()
         key = self._unify_dep(key)
-        if key and key not in self.deps:
+        if key and key not in self._deps_set:
+            self._deps_set.add(key)
             self.deps.append(key)
         return key, type
 
+    # Cache of (current path, dep) -> dep key. The same dep strings recur
+    # across thousands of targets in a large build graph, memoizing avoids
+    # repeated parsing and path normalization.
+    _unify_dep_cache = {}
+
     def _unify_dep(self, dep):
         """Unify dep to key."""
+        cache_key = (self.path, dep)
+        dkey = Target._unify_dep_cache.get(cache_key)
+        if dkey is not None:
+            return dkey
+
         (path, name, msgs) = _parse_target(dep)
 
         if msgs:
+            # Not cached, the error should be reported for each target using it
             for msg in msgs:
                 self.error('Invalid dependency "%s", ' % dep + msg)
             return None
@@ -449,7 +616,8 @@ class Target(object):
         if path == '#':
             # System libaray, they don't have entry in BUILD so we need
             # to add deps manually.
-            dkey = '#:' + name
+            # Not cached, the registering side effect is cheap but required.
+            dkey = intern_str('#:' + name)
             self._add_system_library(dkey, name)
             return dkey
 
@@ -464,7 +632,9 @@ class Target(object):
                 # Depend on library in current directory
                 path = self.path
 
-        return '%s:%s' % (path, name)
+        dkey = intern_str('%s:%s' % (path, name))
+        Target._unify_dep_cache[cache_key] = dkey
+        return dkey
 
     def _init_target_deps(self, deps):
         """Init the target deps.
@@ -480,7 +650,8 @@ class Target(object):
         """
         for d in deps:
             dkey = self._unify_dep(d)
-            if dkey and dkey not in self.deps:
+            if dkey and dkey not in self._deps_set:
+                self._deps_set.add(dkey)
                 self.deps.append(dkey)
 
     def _init_visibility(self, visibility):
@@ -592,11 +763,11 @@ class Target(object):
 
     def _source_file_path(self, name):
         """Expand the the source file name to full path"""
-        return os.path.normpath(os.path.join(self.path, name))
+        return _join_norm(self.path, name)
 
     def _target_file_path(self, file_name):
         """Return the full path of file name in the target dir"""
-        return os.path.normpath(os.path.join(self.target_dir, file_name))
+        return _join_norm(self.target_dir, file_name)
 
     def _remove_build_dir_prefix(self, path):
         """Remove the build dir prefix of path (e.g. build64_release/)
@@ -621,6 +792,7 @@ class Target(object):
         Set the default target if needed.
         """
         self.__targets[label] = path
+        self.__target_files_cache = None
         if not self.__default_target:
             self.__default_target = path
 
@@ -668,13 +840,17 @@ class Target(object):
         All the target files built by the target itself
         """
         self.get_build_code()  # Ensure rules were generated
-        results = set()
-        for _, v in iteritems(self.__targets):
-            if isinstance(v, list):
-                results.update(v)
-            else:
-                results.add(v)
-        return sorted(results)
+        # Cache the result, it may be queried by every dependent and is only
+        # invalidated when a new target file is added.
+        if self.__target_files_cache is None:
+            results = set()
+            for _, v in iteritems(self.__targets):
+                if isinstance(v, list):
+                    results.update(v)
+                else:
+                    results.add(v)
+            self.__target_files_cache = sorted(results)
+        return self.__target_files_cache
 
     def _remove_on_clean(self, *paths):
         """Add paths to clean list, to be removed in clean sub command.
@@ -693,8 +869,11 @@ class Target(object):
         Append the rule to the buffer at first.
         Args:
             rule: the rule generated by certain target
+        NOTE: The rule is buffered without the ending newline, it is added by
+        a single join when the build code is written out, avoiding one string
+        allocation per rule line.
         """
-        self.__build_code.append('%s\n' % rule)
+        self.__build_code.append(rule)
 
     def generate(self):
         """Generate build code for specific target."""
@@ -710,19 +889,21 @@ class Target(object):
                 the entire outer dir instead of single files)
             See ninja documents for description for other args.
         """
-        outputs = var_to_list(outputs)
-        implicit_outputs = var_to_list(implicit_outputs)
-        outs = outputs[:]
-        if implicit_outputs:
-            outs.append('|')
-            outs += implicit_outputs
-        ins = var_to_list(inputs)
+        # This is the hot path of rule generation and most arguments are
+        # already lists, avoid the defensive copy in `var_to_list` and only
+        # allocate new lists when the optional parts are really present.
+        if type(outputs) is not list:
+            outputs = var_to_list(outputs)
+        if type(implicit_outputs) is not list:
+            implicit_outputs = var_to_list(implicit_outputs)
+        outs = outputs + ['|'] + implicit_outputs if implicit_outputs else outputs
+        if type(inputs) is not list:
+            inputs = var_to_list(inputs)
+        ins = inputs
         if implicit_deps:
-            ins.append('|')
-            ins += var_to_list(implicit_deps)
+            ins = ins + ['|'] + var_to_list(implicit_deps)
         if order_only_deps:
-            ins.append('||')
-            ins += var_to_list(order_only_deps)
+            ins = ins + ['||'] + var_to_list(order_only_deps)
         self._write_rule('build %s: %s %s' % (' '.join(outs), rule, ' '.join(ins)))
         clean = (outputs + implicit_outputs) if clean is None else var_to_list(clean)
         if clean:
@@ -755,6 +936,8 @@ class Target(object):
 
 
 class SystemLibrary(Target):
+    __slots__ = ()
+
     def __init__(self, name):
         super(SystemLibrary, self).__init__(
                 name=name,
@@ -766,7 +949,7 @@ class SystemLibrary(Target):
                 tags=['lang:cc', 'type:library', 'type:system'],
                 kwargs={})
         self.path = '#'
-        self.key = '#:' + name
+        self.key = intern_str('#:' + name)
         self.fullname = '//' + self.key
 
     def generate(self):
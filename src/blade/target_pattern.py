@@ -44,9 +44,9 @@ def normalize(target, working_dir):
               '*'   if target is dir
               '...' if target is dir/...
     """
-    if target.startswith('//'):
+    if target[:2] == '//':
         target = target[2:]
-    elif target.startswith('/'):
+    elif target[:1] == '/':
         console.error('Invalid target "%s" starting from root path.' % target)
         target = target[1:]  # Try correct to keep going
     else:  # Relative path
@@ -57,8 +57,24 @@ def normalize(target, working_dir):
 
 
 def normalize_list(targets, working_dir):
-    """Normalize target list from command line form into canonical form."""
-    return [normalize(target, working_dir) for target in targets]
+    """Normalize target list from command line form into canonical form.
+
+    Same as calling `normalize` on each target, but the working dir check is
+    hoisted out of the loop since the list can be large with wildcard patterns.
+    """
+    if working_dir == '.':
+        working_dir = ''  # Relative targets then need no `os.path.join` at all
+    result = []
+    for target in targets:
+        if target[:2] == '//':
+            target = target[2:]
+        elif target[:1] == '/':
+            console.error('Invalid target "%s" starting from root path.' % target)
+            target = target[1:]  # Try correct to keep going
+        elif working_dir:
+            target = os.path.join(working_dir, target)
+        result.append('%s:%s' % _split(target))
+    return result
 
 
 def normalize_str_list(targets, working_dir, sep):
@@ -80,4 +96,5 @@ def match(target_id, pattern):
 
 def is_valid_in_build(pattern):
     """Is a valid target pattern in BUILD file"""
-    return pattern.startswith('//') or pattern.startswith(':')
+    # The tuple form checks both prefixes in a single C level call
+    return pattern.startswith(('//', ':'))
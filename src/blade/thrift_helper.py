@@ -52,7 +52,7 @@ class ThriftParser(object):
     def _parse_file(self):
         for line in open(self.path):
             line = line.strip()
-            if line.startswith('//') or line.startswith('#'):
+            if line.startswith(('//', '#')):
                 continue
             pos = line.find('//')
             if pos != -1:
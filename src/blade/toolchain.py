@@ -68,14 +68,21 @@ class BuildArchitecture(object):
         },
     }
 
+    # Cache of arch -> canonical arch, it is queried repeatedly with few distinct keys
+    _canonical_arch_cache = {}
+
     @staticmethod
     def get_canonical_architecture(arch):
         """Get the canonical architecture from the specified arch."""
+        cache = BuildArchitecture._canonical_arch_cache
+        if arch in cache:
+            return cache[arch]
         canonical_arch = None
         for k, v in iteritems(BuildArchitecture._build_architecture):
             if arch == k or arch in v['alias']:
                 canonical_arch = k
                 break
+        cache[arch] = canonical_arch
         return canonical_arch
 
     @staticmethod
@@ -129,14 +136,18 @@ class ToolChain(object):
             console.fatal('Failed to obtain cc toolchain.')
         return version
 
+    # Cached cc target architecture, it never changes within a process but
+    # obtaining it costs a whole compiler invocation
+    _cc_target_arch = None
+
     @staticmethod
     def get_cc_target_arch():
         """Get the cc target architecture."""
-        cc = ToolChain._get_cc_command('CC', 'gcc')
-        returncode, stdout, stderr = run_command(cc + ' -dumpmachine', shell=True)
-        if returncode == 0:
-            return stdout.strip()
-        return ''
+        if ToolChain._cc_target_arch is None:
+            cc = ToolChain._get_cc_command('CC', 'gcc')
+            returncode, stdout, stderr = run_command(cc + ' -dumpmachine', shell=True)
+            ToolChain._cc_target_arch = stdout.strip() if returncode == 0 else ''
+        return ToolChain._cc_target_arch
 
     def get_cc_commands(self):
         return self.cc, self.cxx, self.ld